@@ -15,8 +15,10 @@ from pathlib import Path
 from collections import deque
 
 from gesture_classifier import GestureClassifier
-from utils import extract_landmark_vector, normalize_vector
+from utils import extract_landmark_vector, normalize_vector, calibration_changed
 from database import set_user_calibration
+from profiler import FrameProfiler
+from recorder import LandmarkRecorder, RECORD_DIR_ENV
 
 # Жесты для калибровки и время удержания (сек)
 CALIB_GESTURES = ['A', 'M', 'S', 'W']
@@ -28,7 +30,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 CALIB_FILE = BASE_DIR / 'models' / 'calibration.json'
 
 
-def main(user_id: int, device_id: int = 0):
+def main(user_id: int, device_id: int = 0, record_dir: str | None = None):
     """
     Калибровка: ждём первого детекта моделью,
     затем удерживаем HOLD_TIME секунд, собираем max_dist и
@@ -37,6 +39,11 @@ def main(user_id: int, device_id: int = 0):
     Args:
         user_id: ID текущего пользователя
         device_id: индекс видеоустройства для захвата
+        record_dir: каталог для записи landmarks фазы удержания
+            с меткой калибруемого жеста (см. recorder.py),
+            по умолчанию из переменной HANDCONTROLLER_RECORD_DIR
+
+    Клавиша 'p' включает/выключает встроенный профилировщик (см. profiler.py).
     """
     cap = cv2.VideoCapture(device_id)
     if not cap.isOpened():
@@ -46,6 +53,9 @@ def main(user_id: int, device_id: int = 0):
     mp_hands = mp.solutions.hands
     classifier = GestureClassifier()
     prediction_window = deque(maxlen=WINDOW_SIZE)
+    profiler = FrameProfiler.from_env('calibration')
+    record_dir = record_dir or os.environ.get(RECORD_DIR_ENV) or None
+    recorder = LandmarkRecorder(record_dir) if record_dir else None
 
     print("=== Начинаем калибровку ===")
     print(f"Используется устройство #{device_id}. Будут калиброваны жесты: {', '.join(CALIB_GESTURES)}")
@@ -65,6 +75,7 @@ def main(user_id: int, device_id: int = 0):
                 ret, frame = cap.read()
                 if not ret:
                     continue
+                profiler.tick()
                 frame = cv2.flip(frame, 1)
                 rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
                 results = hands.process(rgb)
@@ -86,8 +97,13 @@ def main(user_id: int, device_id: int = 0):
                 cv2.putText(frame, f"Detect: {gesture}", (10, 30),
                             cv2.FONT_HERSHEY_SIMPLEX, 1, (0,255,0), 2)
                 cv2.imshow('Calibration', frame)
-                if cv2.waitKey(1) & 0xFF == 27:
+                key = cv2.waitKey(1) & 0xFF
+                profiler.handle_key(key)
+                if key == 27:
                     print("Калибровка прервана пользователем.")
+                    profiler.stop()
+                    if recorder is not None:
+                        recorder.close()
                     cap.release()
                     cv2.destroyAllWindows()
                     return
@@ -97,6 +113,7 @@ def main(user_id: int, device_id: int = 0):
                 ret2, frame2 = cap.read()
                 if not ret2:
                     continue
+                profiler.tick()
                 frame2 = cv2.flip(frame2, 1)
                 rgb2 = cv2.cvtColor(frame2, cv2.COLOR_BGR2RGB)
                 res2 = hands.process(rgb2)
@@ -108,19 +125,29 @@ def main(user_id: int, device_id: int = 0):
                             centered = v3 - v3[0:1, :]
                             max_d = float(np.max(np.linalg.norm(centered, axis=1)))
                             dist_map[gesture].append(max_d)
+                            if recorder is not None:
+                                recorder.record(vect2, 'Left', user_id, gesture)
                             mp.solutions.drawing_utils.draw_landmarks(
                                 frame2, lm2, mp_hands.HAND_CONNECTIONS)
                             break
                 cv2.putText(frame2, f"Hold: {gesture}", (10, 30),
                             cv2.FONT_HERSHEY_SIMPLEX, 1, (255,255,0), 2)
                 cv2.imshow('Calibration', frame2)
-                if cv2.waitKey(1) & 0xFF == 27:
+                key = cv2.waitKey(1) & 0xFF
+                profiler.handle_key(key)
+                if key == 27:
                     print("Калибровка прервана пользователем.")
+                    profiler.stop()
+                    if recorder is not None:
+                        recorder.close()
                     cap.release()
                     cv2.destroyAllWindows()
                     return
             time.sleep(0.5)
 
+    profiler.stop()
+    if recorder is not None:
+        recorder.close()
     cap.release()
     cv2.destroyAllWindows()
 
@@ -130,4 +157,5 @@ def main(user_id: int, device_id: int = 0):
         return
     calib_scale = float(np.mean(means))
     set_user_calibration(user_id, calib_scale)
+    calibration_changed()
     print(f"Калибровка завершена. Scale={calib_scale:.4f} сохранён для user_id={user_id}.")
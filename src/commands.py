@@ -82,6 +82,17 @@ STATIC_COMMANDS: Dict[str, Callable[[], None]] = {
 }
 
 
+def describe(gesture_label: str) -> str:
+    """
+    Имя команды, которую выполнит execute для жеста:
+    имя пользовательского скрипта или имя статической функции.
+    """
+    script = USER_SCRIPTS.get(gesture_label)
+    if script:
+        return script
+    return STATIC_COMMANDS.get(gesture_label, do_nothing).__name__
+
+
 def execute(gesture_label: str) -> None:
     """
     Выполняет команду для распознанного жеста:
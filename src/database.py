@@ -2,6 +2,8 @@
 import sqlite3
 import hashlib
 import time
+import queue
+import threading
 from pathlib import Path
 
 # Путь к базе данных
@@ -12,10 +14,11 @@ DB_PATH = BASE_DIR / 'models' / 'users.db'
 def init_db():
     """
     Инициализация базы: создаются таблицы users (с FIO),
-    calibration и user_scripts
+    calibration, user_scripts и gesture_events
     """
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
+    _enable_wal(c)
     # Таблица пользователей с FIO
     c.execute('''
     CREATE TABLE IF NOT EXISTS users (
@@ -41,10 +44,38 @@ def init_db():
         PRIMARY KEY(user_id, gesture),
         FOREIGN KEY(user_id) REFERENCES users(id)
     )''')
+    _create_events_table(c)
     conn.commit()
     conn.close()
 
 
+def _enable_wal(c: sqlite3.Cursor):
+    """
+    Режим WAL: чтения (например, get_user_calibration из цикла захвата)
+    не ждут фоновых пакетных записей журнала жестов
+    """
+    c.execute('PRAGMA journal_mode=WAL')
+
+
+def _create_events_table(c: sqlite3.Cursor):
+    """Таблица журнала распознанных жестов и сработавших команд"""
+    c.execute('''
+    CREATE TABLE IF NOT EXISTS gesture_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        label TEXT NOT NULL,
+        confidence REAL NOT NULL,
+        latency_ms REAL NOT NULL,
+        command TEXT,
+        created_at TEXT NOT NULL,
+        FOREIGN KEY(user_id) REFERENCES users(id)
+    )''')
+    c.execute(
+        'CREATE INDEX IF NOT EXISTS idx_gesture_events_user '
+        'ON gesture_events(user_id, label)'
+    )
+
+
 def hash_password(password: str) -> str:
     """Простой SHA256-хеш пароля"""
     return hashlib.sha256(password.encode('utf-8')).hexdigest()
@@ -141,4 +172,147 @@ def get_user_scripts(user_id: int) -> dict[str, str]:
     conn.close()
     return {gesture: script for gesture, script in rows}
 
+
+class GestureEventLog:
+    """
+    Журнал событий распознавания с отложенной записью (write-behind).
+    log() только кладёт событие в очередь и никогда не блокирует цикл захвата;
+    фоновый поток собирает события в пачки и коммитит их одним executemany.
+    """
+    def __init__(self, batch_size: int = 64, flush_interval: float = 1.0,
+                 max_pending: int = 10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._stop = threading.Event()
+        self.dropped = 0  # события, не попавшие в БД (переполнение очереди или сбой записи)
+        self._failed = False
+        self._thread = threading.Thread(
+            target=self._run, name='gesture-event-log', daemon=True)
+        self._thread.start()
+
+    def log(self, user_id: int | None, label: str, confidence: float,
+            latency_ms: float, command: str | None = None):
+        """Поставить событие в очередь на запись (без обращения к диску)"""
+        if self._failed:
+            # Фоновый поток не смог открыть БД - событие никуда не попадёт
+            self.dropped += 1
+            return
+        created_at = time.strftime('%Y-%m-%d %H:%M:%S')
+        try:
+            self._queue.put_nowait(
+                (user_id, label, float(confidence), float(latency_ms), command, created_at))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        """Дописать оставшиеся события и остановить фоновый поток"""
+        self._stop.set()
+        self._thread.join()
+        if self.dropped:
+            print(f"[database] Не записано событий журнала жестов: {self.dropped}")
+
+    def _run(self):
+        # Соединение создаётся в фоновом потоке: sqlite3 не разрешает
+        # использовать его из другого потока
+        try:
+            conn = sqlite3.connect(DB_PATH)
+            c = conn.cursor()
+            _enable_wal(c)
+            _create_events_table(c)
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"[database] Журнал жестов отключён, не удалось открыть БД: {e}")
+            self._failed = True
+            # Уже поставленные в очередь события тоже потеряны
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                self.dropped += 1
+            return
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                pass
+            stopping = self._stop.is_set()
+            if stopping:
+                # Забираем всё, что осталось в очереди
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+            if batch and (len(batch) >= self.batch_size
+                          or time.monotonic() >= deadline or stopping):
+                try:
+                    c.executemany(
+                        '''INSERT INTO gesture_events
+                           (user_id, label, confidence, latency_ms, command, created_at)
+                           VALUES (?, ?, ?, ?, ?, ?)''',
+                        batch
+                    )
+                    conn.commit()
+                except sqlite3.Error as e:
+                    print(f"[database] Ошибка записи журнала жестов: {e}")
+                    self.dropped += len(batch)
+                batch = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+            if stopping:
+                break
+        conn.close()
+
+
+def get_gesture_frequency(user_id: int) -> dict[str, int]:
+    """Сколько раз каждый жест был распознан у пользователя"""
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
+    c.execute(
+        '''SELECT label, COUNT(*) FROM gesture_events
+           WHERE user_id = ?
+           GROUP BY label
+           ORDER BY COUNT(*) DESC''',
+        (user_id,)
+    )
+    rows = c.fetchall()
+    conn.close()
+    return {label: count for label, count in rows}
+
+
+def get_latency_percentiles(user_id: int,
+                            percentiles: tuple[float, ...] = (50, 90, 99),
+                            label: str | None = None) -> dict[float, float]:
+    """
+    Перцентили задержки распознавания (мс) для пользователя,
+    опционально только для одного жеста. Метод ближайшего ранга.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
+    if label is None:
+        c.execute(
+            'SELECT latency_ms FROM gesture_events WHERE user_id = ? ORDER BY latency_ms',
+            (user_id,)
+        )
+    else:
+        c.execute(
+            '''SELECT latency_ms FROM gesture_events
+               WHERE user_id = ? AND label = ? ORDER BY latency_ms''',
+            (user_id, label)
+        )
+    values = [row[0] for row in c.fetchall()]
+    conn.close()
+    if not values:
+        return {}
+    result = {}
+    for p in percentiles:
+        rank = max(1, -(-len(values) * p // 100))  # ceil(n * p / 100)
+        result[p] = values[min(int(rank), len(values)) - 1]
+    return result
+
 # Вызов init_db() в точке входа приложения гарантирует создание таблиц
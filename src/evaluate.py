@@ -0,0 +1,408 @@
+# src/evaluate.py
+"""
+Оффлайн-оценка models/gesture_classifier.h5 на записанных наборах данных.
+
+Поддерживаемые входы:
+- .npz: массив landmarks shape (N, 63) или (N, 21, 3) с сырыми координатами,
+  метки labels shape (N,) (или одна метка label на файл); необязательно
+  clip_ids, timestamps (сек) и handedness ('Left'/'Right');
+- .parquet: колонки label, x0, y0, z0, ..., z20; необязательно clip_id,
+  timestamp, handedness;
+- каталог записи recorder.py (meta.json + чанки); кадры без метки пропускаются;
+- каталог с видео вида <root>/<метка>/<клип>.mp4: кадры прогоняются через
+  MediaPipe в пуле процессов, как в realtime.main.
+
+Пример:
+    python src/evaluate.py data/clips.npz data/videos --user-id 1 --json report.json --cache-tolerance
+"""
+import os
+# Отключение логов
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+from utils import extract_landmark_vector, normalize_batch, set_current_user
+from recorder import LandmarkDataset, HANDEDNESS, META_FILE
+from prediction_cache import PredictionCache, CACHE_SIZE, CACHE_TOLERANCE
+
+# Размер окна распознавания (как в realtime.py)
+WINDOW_SIZE = 5
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+# Порядок координат совпадает с extract_landmark_vector
+LANDMARK_COLUMNS = [f'{axis}{i}' for i in range(21) for axis in 'xyz']
+DEFAULT_FPS = 30.0
+# Разрыв по времени (сек), после которого кадры записи считаются новым клипом
+MAX_CLIP_GAP = 1.0
+
+
+def _split_clips(raw: np.ndarray, labels: np.ndarray, clip_ids: np.ndarray | None,
+                 timestamps: np.ndarray | None, handedness: np.ndarray | None,
+                 fps: float) -> list[dict]:
+    """
+    Делит покадровые массивы на клипы: по clip_ids, а если их нет -
+    по непрерывным участкам с одинаковой меткой. Оставляет только
+    кадры левой руки, как realtime.main; клип, в котором левой руки
+    нет совсем, возвращается с пустым raw, чтобы попасть в метрики.
+    """
+    raw = np.asarray(raw, dtype=np.float32).reshape(-1, 63)
+    labels = np.asarray(labels).astype(str)
+    if timestamps is None:
+        timestamps = np.arange(len(raw)) / fps
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    if clip_ids is None:
+        # Новый клип начинается при смене метки
+        clip_ids = np.cumsum(np.r_[True, labels[1:] != labels[:-1]])
+    if len(raw) == 0:
+        return []
+    _, first, inverse = np.unique(clip_ids, return_index=True, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    # Метка и начало клипа - по его первому кадру до фильтрации по руке, чтобы
+    # время до решения включало и задержку обнаружения левой руки
+    clip_label = labels[first]
+    clip_start = timestamps[first]
+    if handedness is not None:
+        left = np.asarray(handedness).astype(str) == 'Left'
+        raw, inverse, timestamps = raw[left], inverse[left], timestamps[left]
+
+    # Группировка кадров по клипам одной сортировкой; пустые группы сохраняются
+    order = np.argsort(inverse, kind='stable')
+    counts = np.bincount(inverse, minlength=len(first))
+    groups = np.split(order, np.cumsum(counts)[:-1])
+    clips = []
+    # Сохраняем порядок клипов как в файле
+    for k in np.argsort(first, kind='stable'):
+        idx = groups[k]
+        clips.append({
+            'label': clip_label[k],
+            'raw': raw[idx],
+            'timestamps': timestamps[idx],
+            'start': float(clip_start[k]),
+        })
+    return clips
+
+
+def load_npz(path: Path, fps: float) -> list[dict]:
+    """Загрузка клипов из .npz"""
+    with np.load(path, allow_pickle=False) as data:
+        raw = data['landmarks']
+        if 'labels' in data:
+            labels = data['labels']
+        else:
+            labels = np.full(len(raw), str(data['label']))
+        return _split_clips(
+            raw, labels,
+            data['clip_ids'] if 'clip_ids' in data else None,
+            data['timestamps'] if 'timestamps' in data else None,
+            data['handedness'] if 'handedness' in data else None,
+            fps,
+        )
+
+
+def load_parquet(path: Path, fps: float) -> list[dict]:
+    """Загрузка клипов из .parquet (нужен pandas с pyarrow)"""
+    try:
+        import pandas as pd
+    except ImportError:
+        raise SystemExit("Для чтения parquet установите pandas и pyarrow")
+    df = pd.read_parquet(path)
+    return _split_clips(
+        df[LANDMARK_COLUMNS].to_numpy(dtype=np.float32), df['label'].to_numpy(),
+        df['clip_id'].to_numpy() if 'clip_id' in df else None,
+        df['timestamp'].to_numpy() if 'timestamp' in df else None,
+        df['handedness'].to_numpy() if 'handedness' in df else None,
+        fps,
+    )
+
+
+def load_recording(path: Path) -> list[dict]:
+    """Загрузка клипов из записи LandmarkRecorder"""
+    dataset = LandmarkDataset(path)
+    if len(dataset) == 0:
+        return []
+    labels = dataset.label_names(dataset.concatenate('label'))
+    labelled = labels != ''
+    labels = labels[labelled]
+    user_ids = dataset.concatenate('user_id')[labelled]
+    timestamps = dataset.concatenate('timestamp')[labelled]
+    # Новый клип при смене метки, пользователя или после паузы в записи
+    # (дозапись другой сессии с той же меткой не должна склеиваться)
+    boundary = ((labels[1:] != labels[:-1]) | (user_ids[1:] != user_ids[:-1])
+                | (np.diff(timestamps) > MAX_CLIP_GAP))
+    clip_ids = np.cumsum(np.r_[True, boundary])
+    return _split_clips(
+        dataset.concatenate('raw')[labelled], labels, clip_ids, timestamps,
+        np.array(HANDEDNESS)[dataset.concatenate('handedness')[labelled]],
+        DEFAULT_FPS,
+    )
+
+
+def _process_video(path: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Рабочая функция пула: прогоняет видео через MediaPipe так же, как
+    realtime.main, и возвращает сырые векторы левой руки и их время (сек).
+    """
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+    vectors, timestamps = [], []
+    frame_idx = 0
+    with mp.solutions.hands.Hands(
+        static_image_mode=False,
+        max_num_hands=2,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    ) as hands:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frame = cv2.flip(frame, 1)
+            results = hands.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            if results.multi_hand_landmarks and results.multi_handedness:
+                for lm, handed in zip(results.multi_hand_landmarks, results.multi_handedness):
+                    if handed.classification[0].label == 'Left':
+                        vectors.append(extract_landmark_vector(lm))
+                        timestamps.append(frame_idx / fps)
+                        break
+            frame_idx += 1
+    cap.release()
+    raw = np.stack(vectors) if vectors else np.empty((0, 63), dtype=np.float32)
+    return raw, np.asarray(timestamps, dtype=np.float64)
+
+
+def load_video_dir(root: Path, workers: int | None) -> list[dict]:
+    """Загрузка клипов из каталога <root>/<метка>/<клип>.<ext> в пуле процессов"""
+    paths = sorted(p for p in root.glob('*/*') if p.suffix.lower() in VIDEO_EXTENSIONS)
+    clips = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path, (raw, timestamps) in zip(
+                paths, pool.map(_process_video, map(str, paths), chunksize=1)):
+            # Время кадров отсчитывается от начала видео
+            clips.append({'label': path.parent.name, 'raw': raw,
+                          'timestamps': timestamps, 'start': 0.0})
+    return clips
+
+
+def load_dataset(path: Path, fps: float, workers: int | None) -> list[dict]:
+    """Определяет формат по пути и загружает клипы"""
+    if path.is_dir() and (path / META_FILE).exists():
+        return load_recording(path)
+    if path.is_dir():
+        return load_video_dir(path, workers)
+    if path.suffix == '.npz':
+        return load_npz(path, fps)
+    if path.suffix == '.parquet':
+        return load_parquet(path, fps)
+    raise SystemExit(f"Неподдерживаемый формат набора данных: {path}")
+
+
+def build_windows(clips: list[dict]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Нарезает каждый клип на неперекрывающиеся окна по WINDOW_SIZE
+    нормализованных кадров - так же, как realtime.main очищает окно
+    после каждой классификации. Хвост короче окна отбрасывается.
+
+    Returns:
+        windows: shape (B, WINDOW_SIZE, 63)
+        clip_index: номер клипа для каждого окна
+        end_time: время последнего кадра окна от начала клипа clip['start'] (сек)
+    """
+    windows, clip_index, end_time = [], [], []
+    for i, clip in enumerate(clips):
+        n = len(clip['raw']) // WINDOW_SIZE
+        if n == 0:
+            continue
+        norm = normalize_batch(clip['raw'][:n * WINDOW_SIZE])
+        windows.append(norm.reshape(n, WINDOW_SIZE, -1))
+        clip_index.append(np.full(n, i))
+        ts = clip['timestamps']
+        end_time.append(ts[WINDOW_SIZE - 1:n * WINDOW_SIZE:WINDOW_SIZE] - clip['start'])
+    if not windows:
+        return np.empty((0, WINDOW_SIZE, 63), dtype=np.float32), np.empty(0, int), np.empty(0)
+    return np.concatenate(windows), np.concatenate(clip_index), np.concatenate(end_time)
+
+
+def replay_cache(windows: np.ndarray, pred: np.ndarray, confidence: np.ndarray,
+                 tolerance: float = CACHE_TOLERANCE, size: int = CACHE_SIZE) -> dict:
+    """
+    Прогоняет окна по порядку через PredictionCache: промахи получают
+    решение без кэша, попадания - ответ кэша. Записи не устаревают
+    (оффлайн нет реального времени), поэтому оценка пессимистична.
+    Возвращает долю попаданий и долю совпадений с решениями без кэша.
+    """
+    cache = PredictionCache(size, tolerance, ttl=float('inf'))
+    mismatches = 0
+    for i, window in enumerate(windows):
+        label, _ = cache.get_or_compute(
+            list(window), None, lambda _window: (pred[i], confidence[i]))
+        mismatches += label != pred[i]
+    return {
+        'tolerance': tolerance,
+        'hit_rate': cache.hit_rate,
+        'agreement': 1 - mismatches / len(windows),
+        'mismatches': int(mismatches),
+    }
+
+
+def evaluate(clips: list[dict], batch_size: int = 4096,
+             cache_tolerance: float | None = None) -> dict:
+    """
+    Прогоняет все окна через GestureClassifier и считает метрики.
+    Если задан cache_tolerance, дополнительно сверяет решения с кэшем и без (replay_cache).
+    """
+    # Импорт здесь, чтобы процессы пула не загружали TensorFlow
+    from gesture_classifier import GestureClassifier
+
+    if not clips:
+        raise SystemExit("В наборе данных нет ни одного клипа")
+    windows, clip_index, end_time = build_windows(clips)
+    true = np.array([clips[i]['label'] for i in clip_index], dtype=str)
+
+    classifier = GestureClassifier()
+    start = time.perf_counter()
+    pred, confidence = classifier.predict_windows(windows, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+    pred = np.asarray(pred).astype(str)
+
+    classes = sorted({str(clip['label']) for clip in clips} | set(pred))
+    pos = {c: k for k, c in enumerate(classes)}
+    confusion = np.zeros((len(classes), len(classes)), dtype=int)
+    np.add.at(confusion, ([pos[c] for c in true], [pos[c] for c in pred]), 1)
+
+    # Время до первого верного решения в каждом клипе
+    latency = {c: [] for c in classes}
+    missed = Counter()
+    no_window = Counter()
+    clip_correct = 0
+    # clip_index отсортирован: делим решения на клипы за один проход
+    clip_ids, bounds = np.unique(clip_index, return_index=True)
+    decisions = dict(zip(clip_ids, zip(np.split(pred, bounds[1:]),
+                                       np.split(end_time, bounds[1:]))))
+    for i, clip in enumerate(clips):
+        label = str(clip['label'])
+        if i not in decisions:
+            # Меньше WINDOW_SIZE кадров левой руки (в т.ч. рука не найдена):
+            # realtime.main не принял бы решения - это ошибка клипа
+            missed[label] += 1
+            no_window[label] += 1
+            continue
+        clip_pred, clip_end = decisions[i]
+        hits = np.flatnonzero(clip_pred == label)
+        if len(hits):
+            latency[label].append(float(clip_end[hits[0]]))
+        else:
+            missed[label] += 1
+        # Клип засчитывается по большинству решений окон
+        if Counter(clip_pred).most_common(1)[0][0] == label:
+            clip_correct += 1
+
+    n_clips = len(clips)
+    report = {
+        'windows': int(len(windows)),
+        'clips': n_clips,
+        'clips_without_window': sum(no_window.values()),
+        'window_accuracy': float(np.mean(pred == true)) if len(windows) else None,
+        'clip_accuracy': clip_correct / n_clips,
+        'classes': classes,
+        'confusion_matrix': confusion.tolist(),
+        'latency_to_decision': {
+            c: {
+                'mean_s': float(np.mean(latency[c])) if latency[c] else None,
+                'median_s': float(np.median(latency[c])) if latency[c] else None,
+                'decided': len(latency[c]),
+                'missed': missed[c],
+                'without_window': no_window[c],
+            }
+            for c in classes if latency[c] or missed[c]
+        },
+        'inference_seconds': elapsed,
+        'windows_per_second': len(windows) / elapsed if len(windows) and elapsed else None,
+        'frames_per_second': (len(windows) * WINDOW_SIZE / elapsed
+                              if len(windows) and elapsed else None),
+    }
+    if cache_tolerance is not None and len(windows):
+        report['cache'] = replay_cache(windows, pred, confidence, cache_tolerance)
+    return report
+
+
+def print_report(report: dict):
+    """Вывод отчёта в консоль"""
+    print(f"Окон: {report['windows']}, клипов: {report['clips']} "
+          f"(без полного окна: {report['clips_without_window']})")
+    if report['window_accuracy'] is not None:
+        print(f"Точность по окнам: {report['window_accuracy']:.4f}")
+    print(f"Точность по клипам: {report['clip_accuracy']:.4f}")
+    if report['windows_per_second'] is not None:
+        print(f"Пропускная способность: {report['windows_per_second']:.1f} окон/с, "
+              f"{report['frames_per_second']:.1f} кадров/с")
+
+    classes = report['classes']
+    width = max(5, *(len(c) for c in classes))
+    print("\nМатрица ошибок (строки - истинные, столбцы - предсказанные):")
+    print(' ' * width + ''.join(f'{c:>{width + 1}}' for c in classes))
+    for c, row in zip(classes, report['confusion_matrix']):
+        print(f'{c:>{width}}' + ''.join(f'{v:>{width + 1}}' for v in row))
+
+    print("\nВремя до решения по классам:")
+    for c, stats in report['latency_to_decision'].items():
+        mean = f"{stats['mean_s']:.3f} с" if stats['mean_s'] is not None else '-'
+        median = f"{stats['median_s']:.3f} с" if stats['median_s'] is not None else '-'
+        print(f"  {c:>{width}}: среднее {mean}, медиана {median}, "
+              f"распознано {stats['decided']}, пропущено {stats['missed']} "
+              f"(без полного окна {stats['without_window']})")
+
+    if 'cache' in report:
+        cache = report['cache']
+        print(f"\nКэш решений (допуск {cache['tolerance']:g}): попаданий {cache['hit_rate']:.1%}, "
+              f"совпадение с решениями без кэша {cache['agreement']:.2%} "
+              f"(расхождений {cache['mismatches']})")
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(
+        description='Оффлайн-оценка классификатора жестов на записанных данных')
+    parser.add_argument('datasets', nargs='+', type=Path,
+                        help='файлы .npz/.parquet или каталоги с видео <метка>/<клип>')
+    parser.add_argument('--user-id', type=int, default=None,
+                        help='нормализовать по калибровке пользователя из БД')
+    parser.add_argument('--batch-size', type=int, default=4096,
+                        help='размер пакета кадров для model.predict')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='число процессов для обработки видео MediaPipe')
+    parser.add_argument('--fps', type=float, default=DEFAULT_FPS,
+                        help='частота кадров, если в данных нет timestamps')
+    parser.add_argument('--cache-tolerance', '--cache-step', type=float, nargs='?',
+                        default=None, const=CACHE_TOLERANCE,
+                        help=f'сверить решения с кэшем PredictionCache и без него; '
+                             f'допуск кэша, по умолчанию {CACHE_TOLERANCE:g}')
+    parser.add_argument('--json', type=Path, default=None,
+                        help='сохранить отчёт в JSON')
+    args = parser.parse_args(argv)
+
+    if args.user_id is not None:
+        set_current_user(args.user_id)
+
+    start = time.perf_counter()
+    clips = []
+    for path in args.datasets:
+        clips.extend(load_dataset(path, args.fps, args.workers))
+    print(f"Загружено клипов: {len(clips)} за {time.perf_counter() - start:.1f} с")
+
+    report = evaluate(clips, args.batch_size, args.cache_tolerance)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
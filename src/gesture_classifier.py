@@ -2,6 +2,9 @@ import pickle
 from pathlib import Path
 import numpy as np
 
+import utils
+from prediction_cache import PredictionCache
+
 # Попробуем импорт из tensorflow или из чистого keras
 try:
     from tensorflow.keras.models import load_model
@@ -17,22 +20,60 @@ class GestureClassifier:
     """
     Обёртка над keras-моделью + sklearn LabelEncoder.
     Загружает модель и энкодер по абсолютным путям из папки models/.
+    Необязательный PredictionCache отвечает на повторяющиеся окна без инференса.
     """
-    def __init__(self):
+    def __init__(self, cache: PredictionCache | None = None):
+        self.cache = cache
+        self.reload()
+
+    def reload(self):
+        """(Пере)загружает модель и энкодер; кэш решений при этом сбрасывается"""
         # Загружаем модель без компиляции (для инференса)
         self.model = load_model(str(MODEL_PATH), compile=False)
         # Загружаем энкодер меток
         with open(ENCODER_PATH, 'rb') as f:
             self.le = pickle.load(f)
+        # Версия модели - время изменения файлов
+        self.model_version = (MODEL_PATH.stat().st_mtime_ns, ENCODER_PATH.stat().st_mtime_ns)
 
     def predict(self, landmarks_batch: list[np.ndarray]) -> str:
         """
         Принимает список из WINDOW_SIZE векторов признаков shape (63,).
         Возвращает строковую метку жеста.
         """
+        return self.predict_with_confidence(landmarks_batch)[0]
+
+    def predict_with_confidence(self, landmarks_batch: list[np.ndarray]) -> tuple[str, float]:
+        """
+        То же, что predict, но дополнительно возвращает усреднённую
+        по окну вероятность выбранного жеста.
+        """
+        if self.cache is not None:
+            generation = (self.model_version, utils.CALIBRATION_VERSION)
+            return self.cache.get_or_compute(landmarks_batch, generation, self._predict)
+        return self._predict(landmarks_batch)
+
+    def _predict(self, landmarks_batch: list[np.ndarray]) -> tuple[str, float]:
         # Выполняем инференс без вывода прогресса
         probs = self.model.predict(np.stack(landmarks_batch), verbose=0)
         # Усредняем вероятности по окну и выбираем наибольшую
         avg = np.mean(probs, axis=0)
         idx = int(np.argmax(avg))
-        return self.le.inverse_transform([idx])[0]
+        return self.le.inverse_transform([idx])[0], float(avg[idx])
+
+    def predict_windows(self, windows: np.ndarray,
+                        batch_size: int = 4096) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Пакетный вариант predict_with_confidence для оффлайн-оценки.
+        Принимает массив окон shape (B, WINDOW_SIZE, 63), прогоняет все кадры
+        одним вызовом model.predict и усредняет вероятности внутри каждого окна.
+        Возвращает (метки shape (B,), вероятности выбранных меток shape (B,)).
+        """
+        n_windows, window_size = windows.shape[:2]
+        if n_windows == 0:
+            return np.array([], dtype=object), np.array([], dtype=np.float32)
+        frames = windows.reshape(n_windows * window_size, -1)
+        probs = self.model.predict(frames, batch_size=batch_size, verbose=0)
+        avg = probs.reshape(n_windows, window_size, -1).mean(axis=1)
+        idx = np.argmax(avg, axis=1)
+        return self.le.inverse_transform(idx), avg[np.arange(n_windows), idx]
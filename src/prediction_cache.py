@@ -0,0 +1,151 @@
+# src/prediction_cache.py
+import os
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+import numpy as np
+
+# Допуск совпадения: евклидово расстояние между средними позами окон (63 координаты,
+# доли калибровочного масштаба руки). Дрожание landmarks с СКО до ~0.02 на кадр
+# даёт расстояние до ~0.11; смещение большого пальца на 0.09 (A / S) - уже ~0.31
+CACHE_TOLERANCE = 0.12
+CACHE_SIZE = 256
+CACHE_TTL = 2.0  # сек
+# Сколько последних записей сравнивать с окном, если точного совпадения ключа нет
+CACHE_PROBE = 8
+# Переменная окружения с размером кэша; кэш выключен, если она не задана
+CACHE_SIZE_ENV = 'HANDCONTROLLER_CACHE_SIZE'
+
+
+def cache_size_from_env() -> int:
+    """Размер кэша из CACHE_SIZE_ENV; 0 - кэш выключен"""
+    value = os.environ.get(CACHE_SIZE_ENV, '').strip()
+    if not value:
+        return 0
+    try:
+        return max(int(value), 0)
+    except ValueError:
+        print(f"[cache] Некорректное значение {CACHE_SIZE_ENV}={value!r}, кэш выключен")
+        return 0
+
+
+class PredictionCache:
+    """
+    LRU-кэш решений классификатора. Окно сравнивается по средней позе
+    (среднее нормализованных векторов по кадрам, 63 координаты):
+    усреднение гасит покадровое дрожание landmarks, которое почти всегда
+    разводит окна целиком. Совпадением считается расстояние между средними
+    позами не больше tolerance. Ключ - хеш средней позы, округлённой с шагом
+    tolerance / sqrt(63), поэтому совпадение ключа гарантирует допуск;
+    при промахе по ключу поза сравнивается с probe последними записями.
+    Записи живут не дольше ttl секунд; при смене поколения (модель или
+    калибровка) кэш полностью очищается.
+    """
+    def __init__(self, max_size: int = CACHE_SIZE, tolerance: float = CACHE_TOLERANCE,
+                 ttl: float = CACHE_TTL, probe: int = CACHE_PROBE):
+        """
+        Args:
+            max_size: максимальное число записей
+            tolerance: допустимое расстояние между средними позами окон;
+                больше допуск - больше попаданий, но выше риск вернуть
+                решение для соседней позы
+            ttl: время жизни записи (сек)
+            probe: сколько последних записей сравнивать при промахе по ключу
+        """
+        self.max_size = max_size
+        self.tolerance = tolerance
+        self._key_step = tolerance / np.sqrt(63)
+        self.ttl = ttl
+        self.probe = probe
+        self._entries: OrderedDict = OrderedDict()
+        self._generation = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._hit_seconds = 0.0
+        self._miss_seconds = 0.0
+
+    def key(self, pose: np.ndarray) -> bytes:
+        """Хеш квантованной средней позы"""
+        quantized = np.floor(pose / self._key_step).astype(np.int32)
+        return hashlib.blake2b(quantized.tobytes(), digest_size=16).digest()
+
+    def _lookup(self, key: bytes, pose: np.ndarray, now: float):
+        # Точное совпадение квантованного ключа
+        entry = self._entries.get(key)
+        if entry is not None:
+            if now < entry[2]:
+                return key
+            del self._entries[key]
+            self.expirations += 1
+        # Ближайшие по времени записи в пределах tolerance от средней позы
+        for i, (cached_key, (_, cached_pose, expires_at)) in enumerate(
+                reversed(self._entries.items())):
+            if i >= self.probe:
+                break
+            if now < expires_at and np.linalg.norm(cached_pose - pose) <= self.tolerance:
+                return cached_key
+        return None
+
+    def clear(self):
+        """Удалить все записи (счётчики сохраняются)"""
+        self._entries.clear()
+
+    def get_or_compute(self, window: list[np.ndarray], generation: Hashable,
+                       compute: Callable[[list[np.ndarray]], tuple]) -> tuple:
+        """
+        Возвращает решение для окна из кэша или вычисляет его через compute.
+
+        Args:
+            window: окно нормализованных векторов shape (63,)
+            generation: версия модели и калибровки; при изменении кэш сбрасывается
+            compute: функция, вычисляющая решение для окна
+        """
+        start = time.perf_counter()
+        if generation != self._generation:
+            if self._entries:
+                self.invalidations += 1
+            self.clear()
+            self._generation = generation
+
+        pose = np.mean(window, axis=0)
+        key = self.key(pose)
+        now = time.monotonic()
+        hit_key = self._lookup(key, pose, now)
+        if hit_key is not None:
+            self._entries.move_to_end(hit_key)
+            self.hits += 1
+            self._hit_seconds += time.perf_counter() - start
+            return self._entries[hit_key][0]
+
+        value = compute(window)
+        self._entries[key] = (value, pose, now + self.ttl)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        self.misses += 1
+        self._miss_seconds += time.perf_counter() - start
+        return value
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        """Счётчики попаданий и средняя задержка ответа (мс)"""
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+            'avg_hit_ms': self._hit_seconds / self.hits * 1000 if self.hits else 0.0,
+            'avg_miss_ms': self._miss_seconds / self.misses * 1000 if self.misses else 0.0,
+        }
@@ -0,0 +1,192 @@
+# src/profiler.py
+import os
+import sys
+import time
+import threading
+import cProfile
+import tracemalloc
+from pathlib import Path
+from collections import Counter
+
+# Каталог для дампов профилирования
+BASE_DIR = Path(__file__).resolve().parent.parent
+PROFILE_DIR = BASE_DIR / 'profiles'
+
+# Переменная окружения для запуска профилирования при старте:
+# "sample" или "cprofile", опционально с длительностью: "sample:30"
+PROFILE_ENV = 'HANDCONTROLLER_PROFILE'
+# Клавиша включения/выключения профилирования в окне OpenCV
+PROFILE_KEY = ord('p')
+PROFILE_MODES = ('sample', 'cprofile')
+DEFAULT_DURATION = 10.0
+SAMPLE_INTERVAL = 0.005  # период сэмплирования стека (сек)
+TOP_ALLOCATIONS = 30
+
+
+class FrameProfiler:
+    """
+    Встроенный профилировщик цикла обработки кадров.
+    Режим 'cprofile' пишет pstats-файл, режим 'sample' - свёрнутые стеки
+    (collapsed stacks, формат flamegraph.pl / speedscope), снятые фоновым
+    потоком с потока захвата. В обоих режимах tracemalloc считает
+    выделения памяти на каждый кадр. Всё сохраняется в PROFILE_DIR.
+    """
+    def __init__(self, name: str, mode: str = 'sample',
+                 duration: float = DEFAULT_DURATION, out_dir: Path = PROFILE_DIR):
+        """
+        Args:
+            name: префикс файлов (например, 'realtime' или 'calibration')
+            mode: 'sample' или 'cprofile'
+            duration: длительность сеанса профилирования (сек)
+            out_dir: каталог для дампов
+        """
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Неизвестный режим профилирования: {mode}")
+        self.name = name
+        self.mode = mode
+        self.duration = duration
+        self.out_dir = Path(out_dir)
+        self.active = False
+        self._started_at = 0.0
+        self._profile = None
+        self._sampler = None
+        self._sampler_stop = threading.Event()
+        self._stacks = Counter()
+        self._own_tracemalloc = False
+        self._snapshot_start = None
+        self._frames = []
+        self._last_mem = 0
+
+    @classmethod
+    def from_env(cls, name: str) -> 'FrameProfiler':
+        """
+        Создаёт профилировщик по переменной PROFILE_ENV.
+        Если переменная задана, профилирование стартует сразу.
+        """
+        value = os.environ.get(PROFILE_ENV, '').strip().lower()
+        if not value:
+            return cls(name)
+        mode, _, seconds = value.partition(':')
+        try:
+            profiler = cls(name, mode, float(seconds) if seconds else DEFAULT_DURATION)
+        except ValueError:
+            print(f"[profiler] Некорректное значение {PROFILE_ENV}={value!r}, "
+                  f"ожидается 'sample' или 'cprofile' с необязательным ':секунды'")
+            return cls(name)
+        profiler.start()
+        return profiler
+
+    def handle_key(self, key: int):
+        """Переключает профилирование по клавише PROFILE_KEY"""
+        if key != PROFILE_KEY:
+            return
+        if self.active:
+            self.stop()
+        else:
+            self.start()
+
+    def start(self):
+        """Начать сеанс профилирования из потока захвата"""
+        if self.active:
+            return
+        self.active = True
+        self._started_at = time.time()
+        self._frames = []
+        self._stacks = Counter()
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._own_tracemalloc = True
+        self._snapshot_start = self._take_snapshot()
+        self._last_mem = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+
+        if self.mode == 'cprofile':
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler_stop.clear()
+            self._sampler = threading.Thread(
+                target=self._sample, args=(threading.get_ident(),),
+                name='frame-profiler-sampler', daemon=True)
+            self._sampler.start()
+        print(f"[profiler] Профилирование ({self.mode}) на {self.duration:g} сек...")
+
+    def tick(self):
+        """
+        Вызывается один раз на кадр: фиксирует выделения памяти
+        за кадр и завершает сеанс по истечении duration.
+        """
+        if not self.active:
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        self._frames.append((current, current - self._last_mem, peak))
+        self._last_mem = current
+        tracemalloc.reset_peak()
+        if time.time() - self._started_at >= self.duration:
+            self.stop()
+
+    def stop(self):
+        """Остановить сеанс и сохранить результаты"""
+        if not self.active:
+            return
+        self.active = False
+        if self._profile is not None:
+            self._profile.disable()
+        if self._sampler is not None:
+            self._sampler_stop.set()
+            self._sampler.join()
+            self._sampler = None
+        snapshot_end = self._take_snapshot()
+        if self._own_tracemalloc:
+            tracemalloc.stop()
+            self._own_tracemalloc = False
+
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        prefix = self.out_dir / f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}-{self.mode}"
+
+        if self._profile is not None:
+            self._profile.dump_stats(f"{prefix}.pstats")
+            self._profile = None
+        else:
+            with open(f"{prefix}.collapsed", 'w', encoding='utf-8') as f:
+                for stack, count in self._stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+
+        # Память по кадрам
+        with open(f"{prefix}.frames.csv", 'w', encoding='utf-8') as f:
+            f.write('frame,current_bytes,delta_bytes,peak_bytes\n')
+            for i, (current, delta, peak) in enumerate(self._frames):
+                f.write(f"{i},{current},{delta},{peak}\n")
+
+        # Места, где за сеанс выделилось больше всего памяти
+        n_frames = max(len(self._frames), 1)
+        diff = snapshot_end.compare_to(self._snapshot_start, 'lineno')
+        with open(f"{prefix}.alloc.txt", 'w', encoding='utf-8') as f:
+            f.write(f"frames: {len(self._frames)}\n")
+            for stat in diff[:TOP_ALLOCATIONS]:
+                f.write(f"{stat}  (~{stat.size_diff / n_frames:.0f} B/frame)\n")
+        snapshot_end.dump(f"{prefix}.tracemalloc")
+        self._snapshot_start = None
+
+        print(f"[profiler] Результаты сохранены: {prefix}.*")
+
+    @staticmethod
+    def _take_snapshot() -> tracemalloc.Snapshot:
+        # Собственные выделения профилировщика и tracemalloc не интересны
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+
+    def _sample(self, thread_id: int):
+        # Периодически снимаем стек потока захвата
+        while not self._sampler_stop.wait(SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{Path(code.co_filename).stem}.{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self._stacks[';'.join(reversed(stack))] += 1
@@ -1,22 +1,60 @@
+import os
 import cv2
 import mediapipe as mp
 import numpy as np
+import time
+import argparse
 from collections import deque
 
+import utils
 from gesture_classifier import GestureClassifier
+from prediction_cache import PredictionCache, cache_size_from_env, CACHE_TOLERANCE, CACHE_TTL, CACHE_SIZE_ENV
 from utils import extract_landmark_vector, normalize_vector
-from commands import execute as execute_command
+from commands import execute as execute_command, describe as describe_command
+from database import GestureEventLog
+from scheduler import AdaptiveScheduler, latency_target_from_env, LATENCY_TARGET_ENV, LOAD_LEVELS
+from profiler import FrameProfiler
+from recorder import LandmarkRecorder, RECORD_DIR_ENV, RECORD_LABEL_ENV
 
 # Размер скользящего окна
 WINDOW_SIZE = 5
 
 
-def main(device_id: int = 0):
+def _create_hands(scheduler: AdaptiveScheduler):
+    """Создаёт детектор MediaPipe Hands с параметрами текущего уровня нагрузки"""
+    return mp.solutions.hands.Hands(
+        static_image_mode=False,
+        model_complexity=scheduler.model_complexity,
+        max_num_hands=scheduler.max_num_hands,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+
+
+def main(device_id: int = 0, latency_target_ms: float | None = None,
+         record_dir: str | None = None, record_label: str | None = None,
+         cache_size: int | None = None, cache_tolerance: float = CACHE_TOLERANCE,
+         cache_ttl: float = CACHE_TTL):
     """
     Запуск распознавания жестов с выбранного видео-устройства.
 
     Args:
         device_id: индекс камеры для захвата (0, 1, ...)
+        latency_target_ms: целевая задержка обработки кадра; при её превышении
+            планировщик снижает сложность модели и частоту обработки.
+            По умолчанию берётся из переменной HANDCONTROLLER_LATENCY_MS
+        record_dir: каталог для записи landmarks всех найденных рук (см. recorder.py),
+            по умолчанию из переменной HANDCONTROLLER_RECORD_DIR. Во время записи
+            планировщик закреплён на полном уровне: каждый кадр, обе руки
+        record_label: метка жеста, сохраняемая вместе с записанными кадрами,
+            по умолчанию из переменной HANDCONTROLLER_RECORD_LABEL
+        cache_size: размер кэша решений классификатора (см. prediction_cache.py);
+            0 - кэш выключен, по умолчанию из переменной HANDCONTROLLER_CACHE_SIZE.
+            Перед включением сверьте решения с кэшем и без: evaluate.py --cache-tolerance
+        cache_tolerance: допустимое расстояние между средними позами окон для попадания в кэш
+        cache_ttl: время жизни записи кэша (сек)
+
+    Клавиша 'p' включает/выключает встроенный профилировщик (см. profiler.py).
     """
     # Инициализация камеры
     cap = cv2.VideoCapture(device_id)
@@ -24,32 +62,63 @@ def main(device_id: int = 0):
         print(f"Не удалось открыть видеоустройство #{device_id}")
         return
 
-    classifier = GestureClassifier()
+    # Удерживаемый жест даёт почти одинаковые окна - по желанию отвечаем из кэша
+    if cache_size is None:
+        cache_size = cache_size_from_env()
+    cache = PredictionCache(cache_size, cache_tolerance, cache_ttl) if cache_size > 0 else None
+    classifier = GestureClassifier(cache=cache)
     prediction_window = deque(maxlen=WINDOW_SIZE)
     last_label = None
+    # Журнал событий пишется в БД фоновым потоком
+    event_log = GestureEventLog()
+    if latency_target_ms is None:
+        latency_target_ms = latency_target_from_env()
+    record_dir = record_dir or os.environ.get(RECORD_DIR_ENV) or None
+    record_label = record_label or os.environ.get(RECORD_LABEL_ENV) or None
+    recorder = LandmarkRecorder(record_dir) if record_dir else None
+    # Запись должна идти с полной частотой кадров и по обеим рукам,
+    # поэтому при записи планировщику доступен только уровень 0
+    scheduler = AdaptiveScheduler(
+        latency_target_ms, levels=LOAD_LEVELS[:1] if recorder else LOAD_LEVELS)
+    profiler = FrameProfiler.from_env('realtime')
 
     mp_hands = mp.solutions.hands
     mp_drawing = mp.solutions.drawing_utils
 
     print(f"=== Запуск распознавания на устройстве #{device_id} ===")
-    with mp_hands.Hands(
-        static_image_mode=False,
-        max_num_hands=2,
-        min_detection_confidence=0.5,
-        min_tracking_confidence=0.5
-    ) as hands:
+    hands = _create_hands(scheduler)
+    try:
         while cap.isOpened():
             ret, frame = cap.read()
             if not ret:
                 break
+            # Сброс дампов профилировщика не должен попадать во время кадра
+            profiler.tick()
+            frame_start = time.perf_counter()
+            frame_time = time.time()
 
             # Отзеркалить для удобства и преобразовать
             frame = cv2.flip(frame, 1)
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = hands.process(frame_rgb)
+            # При высокой нагрузке часть кадров только отображается
+            process = scheduler.should_process()
+            results = None
+            if process:
+                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                results = hands.process(frame_rgb)
+
+            # Запись всех найденных рук (нормализация и диск - в потоке рекордера)
+            if (recorder is not None and results and results.multi_hand_landmarks
+                    and results.multi_handedness):
+                for hand_landmarks, handedness in zip(
+                    results.multi_hand_landmarks,
+                    results.multi_handedness
+                ):
+                    recorder.record(extract_landmark_vector(hand_landmarks),
+                                    handedness.classification[0].label,
+                                    utils.CURRENT_USER_ID, record_label, frame_time)
 
             # Обработка левой руки
-            if results.multi_hand_landmarks and results.multi_handedness:
+            if results and results.multi_hand_landmarks and results.multi_handedness:
                 for hand_landmarks, handedness in zip(
                     results.multi_hand_landmarks,
                     results.multi_handedness
@@ -64,15 +133,31 @@ def main(device_id: int = 0):
                         norm_vect = normalize_vector(raw_vect)
                         prediction_window.append(norm_vect)
 
-                        # Классификация при полном окне
+                        # Классификация при полном окне (с учётом шага планировщика)
                         if len(prediction_window) == WINDOW_SIZE:
-                            pred = classifier.predict(list(prediction_window))
+                            if scheduler.should_classify():
+                                pred, confidence = classifier.predict_with_confidence(
+                                    list(prediction_window))
+                                fire = pred != last_label
+                                command = describe_command(pred) if fire else None
+                                # Пишем событие до запуска команды: задержка не включает
+                                # время самой команды, а жест Q (sys.exit) тоже попадает в журнал
+                                latency_ms = (time.perf_counter() - frame_start) * 1000
+                                event_log.log(utils.CURRENT_USER_ID, pred, confidence,
+                                              latency_ms, command)
+                                if fire:
+                                    last_label = pred
+                                    execute_command(pred)
                             prediction_window.clear()
-                            if pred != last_label:
-                                last_label = pred
-                                execute_command(pred)
                         break
 
+            # Адаптация нагрузки по времени обработки кадра. Во время профилирования
+            # кадры замедлены tracemalloc: не меняем конфигурацию, которую диагностируем
+            if (process and not profiler.active
+                    and scheduler.observe((time.perf_counter() - frame_start) * 1000)):
+                hands.close()
+                hands = _create_hands(scheduler)
+
             # Вывод метки на экран
             if last_label is not None:
                 cv2.putText(
@@ -86,13 +171,45 @@ def main(device_id: int = 0):
                 )
 
             cv2.imshow('Hand Gesture Recognition', frame)
-            if cv2.waitKey(1) & 0xFF in (27, ord('q')):
+            key = cv2.waitKey(1) & 0xFF
+            if key in (27, ord('q')):
                 break
+            profiler.handle_key(key)
+    finally:
+        profiler.stop()
+        hands.close()
+        if recorder is not None:
+            recorder.close()
+        if cache is not None:
+            stats = cache.stats()
+            print(f"[cache] Попаданий {stats['hits']}/{stats['hits'] + stats['misses']} "
+                  f"({stats['hit_rate']:.0%}), попадание {stats['avg_hit_ms']:.2f} мс, "
+                  f"промах {stats['avg_miss_ms']:.2f} мс")
+        # Дописываем накопленные события (в т.ч. при выходе по жесту Q)
+        event_log.close()
 
     cap.release()
     cv2.destroyAllWindows()
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Распознавание жестов с камеры')
     # По умолчанию используем устройство 0
-    main()
+    parser.add_argument('--device', type=int, default=0,
+                        help='индекс камеры для захвата')
+    parser.add_argument('--latency-target', type=float, default=None,
+                        help=f'целевая задержка обработки кадра, мс (по умолчанию '
+                             f'из {LATENCY_TARGET_ENV} или 50)')
+    parser.add_argument('--record-dir', default=None,
+                        help=f'каталог записи landmarks (по умолчанию из {RECORD_DIR_ENV})')
+    parser.add_argument('--record-label', default=None,
+                        help=f'метка жеста для записи (по умолчанию из {RECORD_LABEL_ENV})')
+    parser.add_argument('--cache-size', type=int, default=None,
+                        help=f'размер кэша решений, 0 - выключен (по умолчанию из {CACHE_SIZE_ENV})')
+    parser.add_argument('--cache-tolerance', '--cache-step', type=float, default=CACHE_TOLERANCE,
+                        help='допустимое расстояние между средними позами окон для попадания в кэш')
+    parser.add_argument('--cache-ttl', type=float, default=CACHE_TTL,
+                        help='время жизни записи кэша, сек')
+    args = parser.parse_args()
+    main(args.device, args.latency_target, args.record_dir, args.record_label,
+         args.cache_size, args.cache_tolerance, args.cache_ttl)
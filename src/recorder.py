@@ -0,0 +1,196 @@
+# src/recorder.py
+import os
+import json
+import time
+import queue
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from utils import normalize_vector
+
+# Каталог записей по умолчанию
+BASE_DIR = Path(__file__).resolve().parent.parent
+RECORDINGS_DIR = BASE_DIR / 'recordings'
+
+# Переменные окружения для включения записи без изменения кода
+RECORD_DIR_ENV = 'HANDCONTROLLER_RECORD_DIR'
+RECORD_LABEL_ENV = 'HANDCONTROLLER_RECORD_LABEL'
+
+# Кадров в одном чанке (~20 минут при 30 кадр/с, ~18 МБ на чанк)
+CHUNK_FRAMES = 36000
+META_FILE = 'meta.json'
+HANDEDNESS = ('Left', 'Right')
+
+# Поля чанка: имя -> (dtype, форма одного кадра)
+FIELDS = {
+    'raw': (np.float32, (21, 3)),
+    'norm': (np.float32, (21, 3)),
+    'handedness': (np.uint8, ()),   # индекс в HANDEDNESS
+    'timestamp': (np.float64, ()),  # time.time() кадра
+    'user_id': (np.int32, ()),      # -1, если пользователь не задан
+    'label': (np.int16, ()),        # индекс в meta['labels'], -1 без метки
+}
+
+
+class LandmarkRecorder:
+    """
+    Запись кадров landmarks в предвыделенные memory-mapped чанки (.npy).
+    record() вызывается из потока захвата и только кладёт кадр в очередь;
+    нормализация, запись в memmap и сброс на диск идут в фоновом потоке.
+    Метаданные (число кадров в чанках, словарь меток) хранятся в meta.json.
+    """
+    def __init__(self, out_dir: Path = RECORDINGS_DIR, chunk_frames: int = CHUNK_FRAMES,
+                 flush_interval: float = 1.0, max_pending: int = 4096):
+        """
+        Args:
+            out_dir: каталог записи; если в нём уже есть запись, она дополняется
+            chunk_frames: размер чанка в кадрах
+            flush_interval: период сброса memmap и meta.json на диск (сек)
+            max_pending: размер очереди; при переполнении кадры отбрасываются
+        """
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.flush_interval = flush_interval
+        self.dropped = 0  # кадры, не попавшие в переполненную очередь
+
+        meta_path = self.out_dir / META_FILE
+        if meta_path.exists():
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                self.meta = json.load(f)
+        else:
+            self.meta = {'chunk_frames': chunk_frames, 'labels': [], 'chunks': []}
+        self._label_index = {label: i for i, label in enumerate(self.meta['labels'])}
+        self._arrays = None
+        self._count = 0
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name='landmark-recorder', daemon=True)
+        self._thread.start()
+
+    def record(self, raw_vect: np.ndarray, handedness: str, user_id: int | None = None,
+               label: str | None = None, timestamp: float | None = None):
+        """
+        Поставить кадр в очередь на запись.
+
+        Args:
+            raw_vect: сырой вектор extract_landmark_vector, shape (63,)
+            handedness: 'Left' или 'Right'
+            user_id: ID пользователя
+            label: метка жеста (для обучающих данных)
+            timestamp: время кадра, по умолчанию time.time()
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        try:
+            self._queue.put_nowait((raw_vect, handedness, user_id, label, timestamp))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        """Дописать очередь, сбросить данные на диск и остановить поток"""
+        self._stop.set()
+        self._thread.join()
+        if self.dropped:
+            print(f"[recorder] Не записано кадров (очередь переполнена): {self.dropped}")
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+            if item is not None:
+                self._write(*item)
+            if time.monotonic() - last_flush >= self.flush_interval:
+                self._flush()
+                last_flush = time.monotonic()
+            if self._stop.is_set() and self._queue.empty():
+                break
+        self._flush()
+        self._arrays = None
+
+    def _open_chunk(self):
+        # Новый чанк всегда создаётся с нуля, в т.ч. при дозаписи
+        name = f"chunk_{len(self.meta['chunks']):05d}"
+        chunk_dir = self.out_dir / name
+        chunk_dir.mkdir(exist_ok=True)
+        frames = self.meta['chunk_frames']
+        self._arrays = {
+            field: np.lib.format.open_memmap(
+                chunk_dir / f'{field}.npy', mode='w+', dtype=dtype, shape=(frames, *shape))
+            for field, (dtype, shape) in FIELDS.items()
+        }
+        self._count = 0
+        self.meta['chunks'].append({'name': name, 'count': 0})
+
+    def _write(self, raw_vect, handedness, user_id, label, timestamp):
+        if self._arrays is None or self._count == self.meta['chunk_frames']:
+            if self._arrays is not None:
+                self._flush()
+            self._open_chunk()
+        if label is not None and label not in self._label_index:
+            self._label_index[label] = len(self.meta['labels'])
+            self.meta['labels'].append(label)
+
+        i = self._count
+        arrays = self._arrays
+        arrays['raw'][i] = raw_vect.reshape(21, 3)
+        arrays['norm'][i] = normalize_vector(raw_vect).reshape(21, 3)
+        arrays['handedness'][i] = HANDEDNESS.index(handedness)
+        arrays['timestamp'][i] = timestamp
+        arrays['user_id'][i] = -1 if user_id is None else user_id
+        arrays['label'][i] = -1 if label is None else self._label_index[label]
+        self._count += 1
+
+    def _flush(self):
+        if self._arrays is None:
+            return
+        for array in self._arrays.values():
+            array.flush()
+        self.meta['chunks'][-1]['count'] = self._count
+        # meta.json пишется атомарно: читатель не увидит недописанный файл
+        tmp_path = self.out_dir / (META_FILE + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.out_dir / META_FILE)
+
+
+class LandmarkDataset:
+    """
+    Чтение записи LandmarkRecorder. Чанки открываются через np.load(mmap_mode='r'),
+    поэтому все массивы - это представления над файлами без копирования в память.
+    """
+    def __init__(self, path: Path = RECORDINGS_DIR):
+        self.path = Path(path)
+        with open(self.path / META_FILE, 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.labels: list[str] = self.meta['labels']
+        self.chunks: list[dict[str, np.ndarray]] = []
+        for chunk in self.meta['chunks']:
+            if chunk['count'] == 0:
+                continue
+            self.chunks.append({
+                field: np.load(self.path / chunk['name'] / f'{field}.npy', mmap_mode='r')[:chunk['count']]
+                for field in FIELDS
+            })
+
+    def __len__(self) -> int:
+        return sum(len(chunk['timestamp']) for chunk in self.chunks)
+
+    def field(self, name: str) -> list[np.ndarray]:
+        """Представления поля name по всем чанкам (без копирования)"""
+        return [chunk[name] for chunk in self.chunks]
+
+    def concatenate(self, name: str) -> np.ndarray:
+        """Поле name одним массивом (копирует данные в память)"""
+        return np.concatenate(self.field(name))
+
+    def label_names(self, label_idx: np.ndarray) -> np.ndarray:
+        """Преобразует индексы меток в строки ('' для кадров без метки)"""
+        names = np.array(self.labels + [''], dtype=object)
+        return names[label_idx]
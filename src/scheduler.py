@@ -0,0 +1,155 @@
+# src/scheduler.py
+import os
+
+# Целевая задержка обработки кадра (мс), в пересчёте на каждый захваченный кадр
+LATENCY_TARGET_MS = 50.0
+# Переменная окружения для переопределения цели без изменения кода
+LATENCY_TARGET_ENV = 'HANDCONTROLLER_LATENCY_MS'
+
+# Уровни нагрузки от самого точного к самому дешёвому:
+# - model_complexity: сложность модели MediaPipe Hands (1 - полная, 0 - облегчённая)
+# - max_num_hands: realtime использует только левую руку, поэтому при нагрузке ищем одну
+# - frame_skip: сколько кадров пропускать между обрабатываемыми
+# - stride: классифицировать каждое stride-е заполненное окно
+LOAD_LEVELS = [
+    {'model_complexity': 1, 'max_num_hands': 2, 'frame_skip': 0, 'stride': 1},
+    {'model_complexity': 1, 'max_num_hands': 1, 'frame_skip': 0, 'stride': 1},
+    {'model_complexity': 0, 'max_num_hands': 1, 'frame_skip': 0, 'stride': 1},
+    {'model_complexity': 0, 'max_num_hands': 1, 'frame_skip': 1, 'stride': 1},
+    {'model_complexity': 0, 'max_num_hands': 1, 'frame_skip': 1, 'stride': 2},
+    {'model_complexity': 0, 'max_num_hands': 1, 'frame_skip': 2, 'stride': 2},
+]
+
+
+def latency_target_from_env() -> float:
+    """Целевая задержка из LATENCY_TARGET_ENV или LATENCY_TARGET_MS по умолчанию"""
+    value = os.environ.get(LATENCY_TARGET_ENV, '').strip()
+    if not value:
+        return LATENCY_TARGET_MS
+    try:
+        return float(value)
+    except ValueError:
+        print(f"[scheduler] Некорректное значение {LATENCY_TARGET_ENV}={value!r}, "
+              f"используется {LATENCY_TARGET_MS:g} мс")
+        return LATENCY_TARGET_MS
+
+
+class AdaptiveScheduler:
+    """
+    Следит за временем обработки кадра (экспоненциальное среднее) и
+    переключает уровни LOAD_LEVELS: понижает точность, если задержка
+    держится выше цели, и возвращает её, когда нагрузка спадает.
+
+    С целью сравнивается амортизированная стоимость захваченного кадра:
+    время обработанного кадра, делённое на frame_skip + 1 (пропущенные
+    кадры только отображаются). Иначе пропуск кадров никогда не выглядел бы
+    полезным и планировщик уходил бы на самый дешёвый уровень.
+    """
+    def __init__(self, target_ms: float = LATENCY_TARGET_MS,
+                 levels: list[dict] = LOAD_LEVELS,
+                 smoothing: float = 0.2,
+                 degrade_after: int = 10,
+                 recover_after: int = 60,
+                 recover_ratio: float = 0.6):
+        """
+        Args:
+            target_ms: целевая задержка обработки кадра
+            levels: список уровней нагрузки
+            smoothing: коэффициент экспоненциального сглаживания
+            degrade_after: сколько кадров подряд выше цели до понижения уровня
+            recover_after: сколько кадров подряд ниже target_ms * recover_ratio до повышения
+            recover_ratio: доля цели, ниже которой нагрузка считается спавшей
+        """
+        self.target_ms = target_ms
+        self.levels = levels
+        self.smoothing = smoothing
+        self.degrade_after = degrade_after
+        self.recover_after = recover_after
+        self.recover_ratio = recover_ratio
+        self.level = 0
+        self.avg_ms = None
+        self._over = 0
+        self._under = 0
+        self._cooldown = 0
+        self._frame_counter = 0
+        self._window_counter = 0
+
+    @property
+    def settings(self) -> dict:
+        """Параметры текущего уровня"""
+        return self.levels[self.level]
+
+    @property
+    def model_complexity(self) -> int:
+        return self.settings['model_complexity']
+
+    @property
+    def max_num_hands(self) -> int:
+        return self.settings['max_num_hands']
+
+    def should_process(self) -> bool:
+        """Нужно ли обрабатывать текущий кадр (с учётом frame_skip)"""
+        process = self._frame_counter == 0
+        self._frame_counter = (self._frame_counter + 1) % (self.settings['frame_skip'] + 1)
+        return process
+
+    def should_classify(self) -> bool:
+        """Нужно ли классифицировать текущее заполненное окно (с учётом stride)"""
+        classify = self._window_counter == 0
+        self._window_counter = (self._window_counter + 1) % self.settings['stride']
+        return classify
+
+    def amortized_ms(self, level: int) -> float:
+        """Оценка стоимости захваченного кадра на уровне level по текущему среднему"""
+        return self.avg_ms / (self.levels[level]['frame_skip'] + 1)
+
+    def observe(self, elapsed_ms: float) -> bool:
+        """
+        Учитывает время обработки очередного обработанного кадра.
+        Возвращает True, если изменились параметры MediaPipe
+        (model_complexity / max_num_hands) и детектор нужно пересоздать.
+        """
+        # Первые кадры после переключения (прогрев детектора) не учитываем
+        if self._cooldown > 0:
+            self._cooldown -= 1
+            return False
+
+        if self.avg_ms is None:
+            self.avg_ms = elapsed_ms
+        else:
+            self.avg_ms += self.smoothing * (elapsed_ms - self.avg_ms)
+
+        # Повышаем точность, только если и на уровне выше с запасом уложимся в цель
+        if self.amortized_ms(self.level) > self.target_ms:
+            self._over += 1
+            self._under = 0
+        elif (self.level > 0
+              and self.amortized_ms(self.level - 1) < self.target_ms * self.recover_ratio):
+            self._under += 1
+            self._over = 0
+        else:
+            self._over = 0
+            self._under = 0
+
+        if self._over >= self.degrade_after and self.level < len(self.levels) - 1:
+            return self._switch(self.level + 1)
+        if self._under >= self.recover_after and self.level > 0:
+            return self._switch(self.level - 1)
+        return False
+
+    def _switch(self, level: int) -> bool:
+        old = self.settings
+        cost_ms = self.amortized_ms(self.level)
+        self.level = level
+        new = self.settings
+        print(f"[scheduler] Задержка на кадр {cost_ms:.1f} мс "
+              f"(цель {self.target_ms:.0f} мс), уровень нагрузки {level}: {new}")
+        # Сбрасываем статистику: после переключения время кадра изменится
+        self.avg_ms = None
+        self._over = 0
+        self._under = 0
+        self._cooldown = self.degrade_after
+        self._frame_counter = 0
+        self._window_counter = 0
+        return (old['model_complexity'] != new['model_complexity']
+                or old['max_num_hands'] != new['max_num_hands'])
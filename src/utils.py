@@ -19,12 +19,21 @@ except Exception:
 
 # Текущий пользователь для получения DB-scale
 CURRENT_USER_ID = None
+# Счётчик изменений калибровки (для сброса кэшей решений)
+CALIBRATION_VERSION = 0
 
 
 def set_current_user(user_id: int):
     """Устанавливает текущего пользователя для нормализации по БД"""
     global CURRENT_USER_ID
     CURRENT_USER_ID = user_id
+    calibration_changed()
+
+
+def calibration_changed():
+    """Отмечает смену калибровки: нормализованные векторы теперь другие"""
+    global CALIBRATION_VERSION
+    CALIBRATION_VERSION += 1
 
 
 def extract_landmark_vector(hand_landmarks) -> np.ndarray:
@@ -37,6 +46,21 @@ def extract_landmark_vector(hand_landmarks) -> np.ndarray:
     return np.array(data, dtype=np.float32)
 
 
+def _calibration_scale() -> float | None:
+    """
+    Масштаб калибровки: DB-scale для CURRENT_USER_ID,
+    иначе JSON-scale, иначе None.
+    """
+    if CURRENT_USER_ID is not None:
+        try:
+            db_scale = get_user_calibration(CURRENT_USER_ID)
+            if db_scale:
+                return db_scale
+        except Exception:
+            pass
+    return CALIB_JSON_SCALE
+
+
 def normalize_vector(vect: np.ndarray) -> np.ndarray:
     """
     Центрирует по запястью (индекс 0) и масштабирует векторы:
@@ -49,16 +73,29 @@ def normalize_vector(vect: np.ndarray) -> np.ndarray:
     v3_centered = v3 - v3[0:1, :]
 
     # Определение scale
-    scale = None
-    if CURRENT_USER_ID is not None:
-        try:
-            db_scale = get_user_calibration(CURRENT_USER_ID)
-            if db_scale:
-                scale = db_scale
-        except Exception:
-            scale = None
+    scale = _calibration_scale()
     if scale is None:
-        scale = CALIB_JSON_SCALE or float(np.max(np.linalg.norm(v3_centered, axis=1))) or 1.0
+        scale = float(np.max(np.linalg.norm(v3_centered, axis=1))) or 1.0
 
     v3_scaled = v3_centered / scale
     return v3_scaled.reshape(-1)
+
+
+def normalize_batch(vects: np.ndarray) -> np.ndarray:
+    """
+    Векторизованный normalize_vector для массива кадров shape (N, 63)
+    или (N, 21, 3). Масштаб калибровки определяется один раз на весь массив.
+    Возвращает массив shape (N, 63).
+    """
+    v3 = np.asarray(vects, dtype=np.float32).reshape(-1, 21, 3)
+    v3_centered = v3 - v3[:, 0:1, :]
+
+    scale = _calibration_scale()
+    if scale is None:
+        # Локальный максимум для каждого кадра отдельно
+        scale = np.max(np.linalg.norm(v3_centered, axis=2), axis=1)
+        scale[scale == 0] = 1.0
+        scale = scale[:, None, None]
+
+    v3_scaled = v3_centered / scale
+    return v3_scaled.reshape(len(v3), -1)